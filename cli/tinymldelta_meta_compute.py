@@ -5,7 +5,7 @@
 from __future__ import annotations
 import struct
 import zlib
-from typing import Tuple, Optional, List
+from typing import Tuple, Optional, List, Set
 
 _TFLITE_OK = False
 try:
@@ -20,6 +20,16 @@ except Exception:
         _TFLITE_OK = False
 
 
+# The I/O hash is a CRC32 over little-endian int32 words: each input's
+# [type, *shape], a 0xDEADBEEF separator, then each output's [type, *shape].
+_IO_SIG_WORD = struct.Struct("<i")
+_IO_SIG_SEP = struct.pack("<I", 0xDEADBEEF)
+
+
+# Element size in bytes, indexed by TFLite TensorType; unknown types count as 1.
+_DTYPE_SIZES = bytes([4, 2, 4, 1, 8, 1, 1, 2, 8, 1, 8, 16, 8, 1, 1, 4, 2]) + bytes([1]) * 239
+
+
 def _mix32(x: int, y: int) -> int:
     h = (x ^ (y + 0x9E3779B9 + ((x << 6) & 0xFFFFFFFF) + ((x >> 2) & 0xFFFFFFFF))) & 0xFFFFFFFF
     return h
@@ -34,42 +44,29 @@ def _hash_list_u32(items: List[int]) -> int:
     return h & 0xFFFFFFFF
 
 
-def _dtype_size(tensor_type: int) -> int:
-    table = {
-        0: 4, 1: 2, 2: 4, 3: 1, 4: 8,
-        6: 1, 7: 2, 8: 8, 9: 1, 10: 8,
-        11: 16, 12: 8, 15: 4, 16: 2,
-    }
-    return table.get(tensor_type, 1)
-
-
-def _tensor_bytes(shape_vec, ttype: int) -> int:
-    if shape_vec is None:
+def _tensor_bytes(tensor) -> int:
+    if tensor.ShapeIsNone():
         return 0
+    # A present-but-empty shape is a scalar (one element); unknown (<= 0)
+    # dims count as 1. ShapeAsNumpy() returns 0 rather than [] for rank 0.
     numel = 1
-    for i in range(shape_vec.Length()):
-        dim = shape_vec.Get(i)
-        if dim <= 0:
-            dim = 1
-        numel *= dim
-    return numel * _dtype_size(ttype)
+    if tensor.ShapeLength() > 0:
+        numel = int(tensor.ShapeAsNumpy().clip(min=1).prod(dtype="int64"))
+    ttype = int(tensor.Type())
+    return numel * (_DTYPE_SIZES[ttype] if 0 <= ttype < len(_DTYPE_SIZES) else 1)
 
 
-def _is_constant_tensor(model, subgraph, t_idx: int) -> bool:
-    tensors = subgraph.Tensors()
-    buf_idx = tensors[t_idx].Buffer()
-    if buf_idx < 0:
-        return False
-    buf = model.Buffers(buf_idx)
-    data = buf.DataAsNumpy()
-    return data is not None and len(data) > 0
+def _constant_buffer_ids(model) -> Set[int]:
+    # Buffers carrying data hold weights/constants; DataLength() avoids
+    # materializing each buffer as a NumPy view.
+    return {i for i in range(model.BuffersLength()) if model.Buffers(i).DataLength() > 0}
 
 
 def _collect_model_info(model_buf: bytes, arena_factor: Optional[float]) -> Tuple[int, int, int, int]:
     if not _TFLITE_OK:
         raise RuntimeError("TFLite schema not available. Install: pip install flatbuffers tflite-support")
 
-    model = tflite.Model.Model.GetRootAsModel(model_buf, 0)
+    model = tflite.Model.GetRootAsModel(model_buf, 0)
 
     abi = int(model.Version())
 
@@ -81,31 +78,32 @@ def _collect_model_info(model_buf: bytes, arena_factor: Optional[float]) -> Tupl
     opset_hash = _hash_list_u32(builtin_codes)
 
     sg = model.Subgraphs(0)
+    # Each Tensors(i) call builds a new FlatBuffer table object; do it once.
+    tensors = [sg.Tensors(i) for i in range(sg.TensorsLength())]
 
-    def _tensor_sig(t_idx: int):
-        t = sg.Tensors(t_idx)
-        sig = [int(t.Type())]
-        shape = t.ShapeAsNumpy()
-        if shape is not None:
-            sig.extend([int(v) for v in shape.tolist()])
-        return sig
+    def _tensor_sig_crc(t_idx: int, crc: int) -> int:
+        t = tensors[t_idx]
+        crc = zlib.crc32(_IO_SIG_WORD.pack(int(t.Type())), crc)
+        if t.ShapeLength() > 0:
+            crc = zlib.crc32(t.ShapeAsNumpy().astype("<i4", copy=False).tobytes(), crc)
+        return crc
 
-    io_sig = []
+    crc = 0
     for i in range(sg.InputsLength()):
-        io_sig.extend(_tensor_sig(sg.Inputs(i)))
-    io_sig.append(0xDEADBEEF)
+        crc = _tensor_sig_crc(sg.Inputs(i), crc)
+    crc = zlib.crc32(_IO_SIG_SEP, crc)
     for i in range(sg.OutputsLength()):
-        io_sig.extend(_tensor_sig(sg.Outputs(i)))
-    io_hash = zlib.crc32(struct.pack("<%di" % len(io_sig), *io_sig)) & 0xFFFFFFFF
+        crc = _tensor_sig_crc(sg.Outputs(i), crc)
+    io_hash = crc & 0xFFFFFFFF
 
     req_arena = 0
     if arena_factor and arena_factor > 0:
+        const_buf_ids = _constant_buffer_ids(model)
         total = 0
-        for t_idx in range(sg.TensorsLength()):
-            if _is_constant_tensor(model, sg, t_idx):
+        for tensor in tensors:
+            if tensor.Buffer() in const_buf_ids:
                 continue
-            tensor = sg.Tensors(t_idx)
-            total += _tensor_bytes(tensor.Shape(), int(tensor.Type()))
+            total += _tensor_bytes(tensor)
         req_arena = int(total * float(arena_factor))
 
     return abi & 0xFFFF, opset_hash & 0xFFFFFFFF, io_hash & 0xFFFFFFFF, req_arena
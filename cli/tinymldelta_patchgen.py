@@ -41,8 +41,13 @@ Manual metadata overrides (take precedence over auto-meta):
 """
 
 import argparse
+import itertools
+import mmap
+import os
+import stat
 import struct
 import zlib
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
 # Try to import optional TFLite-aware metadata helper.
@@ -52,6 +57,20 @@ try:
 except Exception:
     compute_from_tflite = None  # type: ignore
 
+# NumPy is optional. When present, the byte-level diff scan runs vectorized;
+# otherwise we fall back to the pure-Python loops below.
+try:
+    import numpy as np  # type: ignore
+except Exception:
+    np = None  # type: ignore
+
+# python-isal is optional. Its crc32 folds with PCLMULQDQ and is much faster
+# than stock zlib on large buffers; results are bit-identical to zlib.crc32.
+try:
+    from isal import isal_zlib as _isal_zlib  # type: ignore
+except Exception:
+    _isal_zlib = None  # type: ignore
+
 # --------------------------------------------------------------------------- #
 #                           Wire-format constants                             #
 # --------------------------------------------------------------------------- #
@@ -62,6 +81,24 @@ HDR_FMT = "<BBHII32s32sHH"
 #: Chunk header layout (see tmd_chunk_hdr_t in C runtime; little-endian).
 CHUNK_FMT = "<IHBb"  # off,len,enc,has_crc
 
+#: Maximum number of buffers per writev(2) call (IOV_MAX; 1024 on Linux).
+try:
+    _IOV_MAX = os.sysconf("SC_IOV_MAX")
+except (AttributeError, ValueError, OSError):
+    _IOV_MAX = 1024
+if _IOV_MAX <= 0:
+    _IOV_MAX = 1024
+
+#: Chunks per streamed batch; each chunk is up to three writev buffers.
+_STREAM_BATCH_CHUNKS = max(1, _IOV_MAX // 3)
+
+# Precompiled packers, so hot loops don't re-parse the format strings.
+_HDR_STRUCT = struct.Struct(HDR_FMT)
+_CHUNK_STRUCT = struct.Struct(CHUNK_FMT)
+_TLV_HDR_STRUCT = struct.Struct("<BB")  # tag,len
+_U16_STRUCT = struct.Struct("<H")
+_U32_STRUCT = struct.Struct("<I")
+
 # Digest algorithms (must match runtime enum)
 ALGO_NONE = 0
 ALGO_CRC32 = 1
@@ -77,10 +114,42 @@ TMD_META_OPSET_HASH = 0x03
 TMD_META_IO_HASH = 0x04
 
 
+# --------------------------------------------------------------------------- #
+#                              Checksum helpers                               #
+# --------------------------------------------------------------------------- #
+
+#: Buffers at least this large are checksummed with ISA-L when available;
+#: below it the call overhead outweighs the SIMD speedup.
+ISAL_MIN_BYTES = 4096
+
+
+def crc32(data) -> int:
+    """Compute the CRC32 (zlib polynomial) of a buffer.
+
+    Uses ISA-L for large buffers when python-isal is installed, and
+    zlib.crc32 otherwise. Both yield the same value.
+
+    Args:
+        data: Any object supporting the buffer protocol.
+
+    Returns:
+        Unsigned 32-bit CRC.
+    """
+    if _isal_zlib is not None and len(data) >= ISAL_MIN_BYTES:
+        return _isal_zlib.crc32(data) & 0xFFFFFFFF
+    return zlib.crc32(data) & 0xFFFFFFFF
+
+
 # --------------------------------------------------------------------------- #
 #                          RLE compression helpers                            #
 # --------------------------------------------------------------------------- #
 
+#: Inputs at least this long are RLE-encoded with NumPy. Its fixed cost of
+#: ~18 us per call loses to the Python loop on shorter (typical) diff runs;
+#: the two cross over at about 256 bytes.
+RLE_NUMPY_MIN_BYTES = 256
+
+
 def rle_encode(data: bytes) -> bytes:
     """Encode a byte string using a simple RLE scheme.
 
@@ -98,6 +167,34 @@ def rle_encode(data: bytes) -> bytes:
         RLE-encoded bytes. May be longer than the input; the caller is
         responsible for choosing between raw vs RLE.
     """
+    if np is not None and len(data) >= RLE_NUMPY_MIN_BYTES:
+        return _rle_encode_numpy(data)
+    return _rle_encode_py(data)
+
+
+def _rle_encode_numpy(data: bytes) -> bytes:
+    """NumPy implementation of rle_encode()."""
+    arr = np.frombuffer(data, dtype=np.uint8)
+    if arr.size == 0:
+        return b""
+
+    starts = np.flatnonzero(np.concatenate(([True], arr[1:] != arr[:-1])))
+    lens = np.diff(np.append(starts, arr.size))
+
+    # Split runs longer than 256 into full 256-byte pieces plus a remainder.
+    reps = (lens + 255) // 256
+    vals = np.repeat(arr[starts], reps)
+    counts = np.full(vals.size, 256, dtype=np.int64)
+    counts[np.cumsum(reps) - 1] = lens - (reps - 1) * 256
+
+    out = np.empty((vals.size, 2), dtype=np.uint8)
+    out[:, 0] = counts & 0xFF  # count==256 is encoded as 0
+    out[:, 1] = vals
+    return out.tobytes()
+
+
+def _rle_encode_py(data: bytes) -> bytes:
+    """Pure-Python implementation of rle_encode()."""
     out = bytearray()
     i = 0
     n = len(data)
@@ -117,6 +214,14 @@ def rle_encode(data: bytes) -> bytes:
 #                          Diff / coalescing helpers                          #
 # --------------------------------------------------------------------------- #
 
+#: Tile size for the NumPy diff scan; small enough that both input slices
+#: and the mismatch mask stay cache-resident.
+DIFF_TILE_BYTES = 64 * 1024
+
+#: Block size for the pure-Python diff scan; identical blocks are skipped
+#: with one memcmp-backed comparison.
+PY_DIFF_BLOCK_BYTES = 4096
+
 def find_diffs(base: bytes, target: bytes, merge_gap: int = 16):
     """Identify byte ranges where target differs from base.
 
@@ -124,6 +229,9 @@ def find_diffs(base: bytes, target: bytes, merge_gap: int = 16):
     base[i:i+len] != target[i:i+len]. Adjacent runs that are close
     (within merge_gap) are merged to reduce chunk count.
 
+    Uses a vectorized NumPy scan when NumPy is installed, and a pure-Python
+    loop otherwise. Both produce identical output.
+
     Args:
         base:   Original byte array.
         target: Desired byte array.
@@ -133,38 +241,197 @@ def find_diffs(base: bytes, target: bytes, merge_gap: int = 16):
     Returns:
         List of (offset, bytes) pairs describing the new data to write.
     """
-    diffs = []
+    return [
+        (start, bytes(target[start:end]))
+        for start, end in _diff_runs(base, target, merge_gap)
+    ]
+
+
+def _diff_runs(base, target, merge_gap: int):
+    """Like find_diffs(), but return [start, end) index pairs only."""
+    if np is not None:
+        starts, ends = _diff_runs_numpy(base, target, merge_gap)
+        return [list(run) for run in zip(starts.tolist(), ends.tolist())]
+    return _diff_runs_py(base, target, merge_gap)
+
+
+def _diff_runs_numpy(base, target, merge_gap: int):
+    """NumPy implementation of _diff_runs(), returning (starts, ends) arrays."""
+    b = np.frombuffer(base, dtype=np.uint8)
+    t = np.frombuffer(target, dtype=np.uint8)
+    n = min(b.size, t.size)
+
+    # Run boundaries are the rising/falling edges of the mismatch mask. The
+    # mask is built one tile at a time into a reused scratch buffer so the
+    # compare and edge scan stay cache-resident instead of materializing an
+    # n-byte mask. `prev` carries open runs across tile boundaries.
+    scratch = np.empty(min(n, DIFF_TILE_BYTES), dtype=np.bool_)
+    tile_edges = []
+    prev = 0
+    for lo in range(0, n, DIFF_TILE_BYTES):
+        hi = min(lo + DIFF_TILE_BYTES, n)
+        mask = np.not_equal(b[lo:hi], t[lo:hi], out=scratch[: hi - lo])
+        if not mask.any():
+            if prev:
+                tile_edges.append(np.array([lo]))
+                prev = 0
+            continue
+        edges = np.flatnonzero(np.diff(mask.view(np.int8), prepend=np.int8(prev)))
+        tile_edges.append(edges + lo)
+        prev = int(mask[-1])
+    if prev:
+        tile_edges.append(np.array([n]))
+
+    edges = np.concatenate(tile_edges) if tile_edges else np.empty(0, np.intp)
+    starts = edges[0::2]
+    ends = edges[1::2]
+
+    # If target is longer, append the tail as a diff.
+    if t.size > n:
+        starts = np.append(starts, n)
+        ends = np.append(ends, t.size)
+
+    if starts.size == 0:
+        return starts, ends
+
+    # Merge nearby diffs: a new run starts only where the gap to the
+    # previous run exceeds merge_gap.
+    split = (starts[1:] - ends[:-1]) > merge_gap
+    starts = starts[np.concatenate(([True], split))]
+    ends = ends[np.concatenate((split, [True]))]
+    return starts, ends
+
+
+def _diff_runs_py(base, target, merge_gap: int):
+    """Pure-Python implementation of _diff_runs()."""
+    runs = []
     i = 0
     n = min(len(base), len(target))
     while i < n:
-        if base[i] != target[i]:
+        # Skip identical blocks with a single C-level compare; only blocks
+        # that contain a difference are scanned byte by byte.
+        block_end = min(i + PY_DIFF_BLOCK_BYTES, n)
+        if base[i:block_end] == target[i:block_end]:
+            i = block_end
+            continue
+        while i < block_end:
+            if i + 8 <= block_end:
+                # SWAR: XOR 8-byte little-endian words; the lowest set bit
+                # of a non-zero result locates the first differing byte.
+                w = (int.from_bytes(base[i:i + 8], "little")
+                     ^ int.from_bytes(target[i:i + 8], "little"))
+                if w == 0:
+                    i += 8
+                    continue
+                i += ((w & -w).bit_length() - 1) >> 3
+            elif base[i] == target[i]:
+                i += 1
+                continue
             start = i
             i += 1
             while i < n and base[i] != target[i]:
                 i += 1
-            diffs.append([start, bytearray(target[start:i])])
-        else:
-            i += 1
+            runs.append([start, i])
 
     # If target is longer, append the tail as a diff.
     if len(target) > n:
-        diffs.append([n, bytearray(target[n:])])
+        runs.append([n, len(target)])
 
-    if not diffs:
+    if not runs:
         return []
 
-    # Merge nearby diffs to reduce record count.
-    merged = [diffs[0]]
-    for off, data in diffs[1:]:
-        prev_off, prev_data = merged[-1]
-        prev_end = prev_off + len(prev_data)
-        if off - prev_end <= merge_gap:
-            # Fill any gap then append the new data.
-            merged[-1][1].extend(target[prev_end:off])
-            merged[-1][1].extend(data)
+    # Merge nearby diffs to reduce record count. Runs are index pairs, so
+    # merging just moves the end and never copies bytes.
+    merged = [runs[0]]
+    for start, end in runs[1:]:
+        if start - merged[-1][1] <= merge_gap:
+            merged[-1][1] = end
         else:
-            merged.append([off, data])
-    return [(off, bytes(data)) for off, data in merged]
+            merged.append([start, end])
+    return merged
+
+
+def _coalesce_runs(runs, merge_gap: int, min_chunk: int):
+    """Coalesce very small runs into their predecessor if close enough.
+
+    Args:
+        runs:      [start, end) index pairs, as from _diff_runs_py().
+        merge_gap: Maximum distance to the predecessor's end.
+        min_chunk: Runs shorter than this are candidates for coalescing.
+
+    Returns:
+        List of [start, end) pairs.
+    """
+    coalesced = []
+    for start, end in runs:
+        if (
+            coalesced
+            and (end - start < min_chunk)
+            and (start <= coalesced[-1][1] + merge_gap)
+        ):
+            coalesced[-1][1] = end
+        else:
+            coalesced.append([start, end])
+    return coalesced
+
+
+def _coalesce_runs_numpy(starts, ends, merge_gap: int, min_chunk: int):
+    """NumPy implementation of _coalesce_runs() on (starts, ends) arrays."""
+    if starts.size == 0:
+        return starts, ends
+    # A run folds into its predecessor iff it is small and close. Group ends
+    # are monotonic, so the predecessor's end is always ends[j - 1].
+    fold = np.zeros(starts.size, dtype=np.bool_)
+    fold[1:] = ((ends[1:] - starts[1:]) < min_chunk) & (
+        starts[1:] <= ends[:-1] + merge_gap
+    )
+    keep = ~fold
+    return starts[keep], ends[np.append(keep[1:], True)]
+
+
+# --------------------------------------------------------------------------- #
+#                              Chunk builder                                  #
+# --------------------------------------------------------------------------- #
+
+def iter_chunks(base, target, merge_gap: int = 16, min_chunk: int = 8):
+    """Diff base against target and yield the result as patch chunks.
+
+    Finds the diff runs (_diff_runs_numpy(), or _diff_runs_py() without
+    NumPy), coalesces small ones (_coalesce_runs_numpy() / _coalesce_runs())
+    and picks RAW or RLE for each.
+
+    Chunks are produced lazily, and their data is a memoryview rather than a
+    copy: RAW chunks view target directly, so they can be handed to
+    writev(2) without ever being copied through Python. Exhaust or close the
+    generator before closing an mmap'd target.
+
+    Args:
+        base:      Original byte array.
+        target:    Desired byte array.
+        merge_gap: See find_diffs().
+        min_chunk: See _coalesce_runs().
+
+    Yields:
+        (offset, enc, data) tuples, with enc one of ENC_RAW/ENC_RLE and data
+        a bytes-like object.
+    """
+    if np is not None:
+        starts, ends = _diff_runs_numpy(base, target, merge_gap)
+        starts, ends = _coalesce_runs_numpy(starts, ends, merge_gap, min_chunk)
+        runs = zip(starts.tolist(), ends.tolist())
+    else:
+        runs = _diff_runs_py(base, target, merge_gap)
+        runs = _coalesce_runs(runs, merge_gap, min_chunk)
+
+    # Encode chunks with optional RLE
+    tview = memoryview(target)
+    for start, end in runs:
+        raw = tview[start:end]
+        rle = rle_encode(raw)
+        if len(rle) < len(raw):
+            yield start, ENC_RLE, rle
+        else:
+            yield start, ENC_RAW, raw
 
 
 # --------------------------------------------------------------------------- #
@@ -189,7 +456,10 @@ def tlv(tag: int, payload: bytes) -> bytes:
     """
     if len(payload) > 255:
         raise ValueError("TLV payload too large (>255 bytes)")
-    return struct.pack("<BB", tag & 0xFF, len(payload)) + payload
+    out = bytearray(_TLV_HDR_STRUCT.size + len(payload))
+    _TLV_HDR_STRUCT.pack_into(out, 0, tag & 0xFF, len(payload))
+    out[_TLV_HDR_STRUCT.size:] = payload
+    return bytes(out)
 
 
 # --------------------------------------------------------------------------- #
@@ -207,20 +477,20 @@ def debug_print_patch_header(path: str) -> None:
     """
     try:
         with open(path, "rb") as f:
-            hdr_bytes = f.read(struct.calcsize(HDR_FMT))
+            hdr_bytes = f.read(_HDR_STRUCT.size)
     except OSError as e:
         print(f"[TinyMLDelta] Failed to open patch for header debug: {path} ({e})")
         return
 
-    if len(hdr_bytes) < struct.calcsize(HDR_FMT):
+    if len(hdr_bytes) < _HDR_STRUCT.size:
         print(f"[TinyMLDelta] Patch too small to contain header: {path}")
         return
 
     v, algo, chunks_n, base_len, target_len, base_chk, tgt_chk, meta_len, flags = \
-        struct.unpack(HDR_FMT, hdr_bytes)
+        _HDR_STRUCT.unpack(hdr_bytes)
 
     # Print a short hex dump of the first 16 bytes
-    first16 = " ".join(f"{b:02x}" for b in hdr_bytes[:16])
+    first16 = hdr_bytes[:16].hex(" ")
 
     print("[TinyMLDelta] Patch header debug:")
     print(f"  file       : {path}")
@@ -234,6 +504,144 @@ def debug_print_patch_header(path: str) -> None:
     print(f"  flags      : 0x{flags:04x}")
 
 
+# --------------------------------------------------------------------------- #
+#                               File helpers                                  #
+# --------------------------------------------------------------------------- #
+
+#: Block size for same_bytes() comparisons.
+SAME_BYTES_BLOCK = 1 << 20
+
+def map_model(path: str):
+    """Map a model file read-only into memory.
+
+    The returned object supports the buffer protocol, so it can be hashed
+    with crc32() and wrapped with np.frombuffer() without copying the
+    file into a bytes object. The OS pages the file in on demand.
+
+    Args:
+        path: Path to the model (or any binary) file.
+
+    Returns:
+        A read-only mmap.mmap of the file, or its bytes if it is empty or not
+        a regular file (pipes, /dev/stdin, process substitution), neither of
+        which can be mapped. Callers should close() mmap results when done.
+    """
+    with open(path, "rb") as f:
+        st = os.fstat(f.fileno())
+        if st.st_size == 0 or not stat.S_ISREG(st.st_mode):
+            return f.read()
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def same_bytes(a, b) -> bool:
+    """Return True if two buffers hold identical bytes.
+
+    Compares block by block (each a memcmp on slices), so memory use stays
+    bounded for mmap'd inputs and the scan stops at the first differing
+    block.
+
+    Args:
+        a: First bytes-like object (bytes, mmap, ...).
+        b: Second bytes-like object.
+    """
+    if len(a) != len(b):
+        return False
+    for i in range(0, len(a), SAME_BYTES_BLOCK):
+        if a[i:i + SAME_BYTES_BLOCK] != b[i:i + SAME_BYTES_BLOCK]:
+            return False
+    return True
+
+
+def write_parts(out, parts) -> None:
+    """Write a sequence of bytes-like objects to an open binary file.
+
+    On POSIX the buffers are handed to os.writev() directly, so memoryviews
+    of an mmap'd model reach write(2) without a userspace copy. Elsewhere
+    they are joined and written with a single write().
+
+    Args:
+        out:   File object opened for binary writing.
+        parts: Bytes-like objects, written back to back.
+    """
+    if not hasattr(os, "writev"):
+        out.write(b"".join(parts))
+        return
+
+    out.flush()
+    fd = out.fileno()
+    views = [memoryview(p) for p in parts if len(p)]
+    i = 0
+    while i < len(views):
+        written = os.writev(fd, views[i:i + _IOV_MAX])
+        # Skip fully written buffers; resume a partial one where it stopped.
+        while written:
+            size = len(views[i])
+            if written >= size:
+                written -= size
+                i += 1
+            else:
+                views[i] = views[i][written:]
+                written = 0
+
+
+#: Chunks at least this large are checksummed on the thread pool. Typical
+#: chunks are tens of bytes; for those a pool round-trip costs far more than
+#: the CRC itself, and zlib only releases the GIL above ~5 KiB anyway.
+PARALLEL_CRC_MIN_BYTES = 8 * 1024
+
+
+def stream_chunks(out, chunks, chunk_has_crc: int):
+    """Write encoded chunks to an open patch file, one batch at a time.
+
+    Only a single batch of chunks (sized to fit one writev(2) call) is alive
+    at a time, so peak memory does not grow with the patch size.
+
+    Args:
+        out:           File object opened for binary writing.
+        chunks:        Iterable of (offset, enc, data), e.g. iter_chunks().
+        chunk_has_crc: 1 to emit a CRC32 after each chunk header, else 0.
+
+    Returns:
+        (number of chunks written, total encoded data bytes).
+    """
+    pack_chunk = _CHUNK_STRUCT.pack
+    pack_crc = _U32_STRUCT.pack
+    chunks = iter(chunks)
+    chunks_n = 0
+    encoded_bytes = 0
+
+    # The CRC backends release the GIL on large buffers, so a thread pool
+    # spreads the checksums of big chunks across cores without pickling;
+    # small chunks are checksummed inline.
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as ex:
+        while True:
+            batch = list(itertools.islice(chunks, _STREAM_BATCH_CHUNKS))
+            if not batch:
+                break
+            if chunk_has_crc:
+                crcs = [
+                    None if len(data) >= PARALLEL_CRC_MIN_BYTES else crc32(data)
+                    for _, _, data in batch
+                ]
+                big = [i for i, crc in enumerate(crcs) if crc is None]
+                for i, crc in zip(big, ex.map(crc32, [batch[i][2] for i in big])):
+                    crcs[i] = crc
+            else:
+                crcs = [0] * len(batch)
+
+            parts = []
+            for (off, enc, data), crc in zip(batch, crcs):
+                parts.append(pack_chunk(off, len(data), enc, chunk_has_crc))
+                if chunk_has_crc:
+                    parts.append(pack_crc(crc))
+                parts.append(data)
+                encoded_bytes += len(data)
+            write_parts(out, parts)
+            chunks_n += len(batch)
+
+    return chunks_n, encoded_bytes
+
+
 # --------------------------------------------------------------------------- #
 #                              Main entry point                               #
 # --------------------------------------------------------------------------- #
@@ -242,11 +650,11 @@ def main() -> None:
     """CLI entry point for TinyMLDelta patch generator.
 
     It:
-      1) Reads the base and target model bytes.
-      2) Computes byte-level diffs (and merges nearby runs).
-      3) Optionally derives TFLite metadata (arena, ABI, opset, I/O hash).
-      4) Applies manual metadata overrides, if provided.
-      5) Encodes everything into the TinyMLDelta patch wire format.
+      1) Maps the base and target model files into memory.
+      2) Optionally derives TFLite metadata (arena, ABI, opset, I/O hash).
+      3) Applies manual metadata overrides, if provided.
+      4) Computes byte-level diffs (and merges nearby runs).
+      5) Streams everything out in the TinyMLDelta patch wire format.
     """
     ap = argparse.ArgumentParser(
         description="TinyMLDelta patch generator (TFLite-first)."
@@ -314,34 +722,27 @@ def main() -> None:
 
     args = ap.parse_args()
 
-    # 1) Load models
-    with open(args.base, "rb") as f:
-        base = f.read()
-    with open(args.target, "rb") as f:
-        target = f.read()
+    # The models are mmap'd, so truncating one of them to write the patch
+    # would pull the pages out from under the mapping (SIGBUS).
+    for path in (args.base, args.target):
+        if os.path.exists(args.out) and os.path.exists(path) \
+                and os.path.samefile(args.out, path):
+            ap.error(f"output patch path is the same file as input {path}")
 
-    # 2) Compute raw diffs
-    diffs = find_diffs(base, target, merge_gap=args.merge_gap)
+    # 1) Map models (no full copy into Python bytes)
+    base = map_model(args.base)
+    target = map_model(args.target)
 
-    # 3) Coalesce very small diffs into their predecessor if close enough
-    coalesced = []
-    for off, data in diffs:
-        if (
-            coalesced
-            and (len(data) < args.min_chunk)
-            and (off <= coalesced[-1][0] + len(coalesced[-1][1]) + args.merge_gap)
-        ):
-            prev_off, prev_data = coalesced[-1]
-            gap = target[prev_off + len(prev_data):off]
-            coalesced[-1] = (prev_off, prev_data + gap + data)
-        else:
-            coalesced.append((off, data))
-    diffs = coalesced
+    # Identical models (common for idempotent CI releases) need no diff,
+    # and share a digest. The compare bails out at the first differing block.
+    identical = same_bytes(base, target)
 
-    # 4) Header digests
+    # 2) Header digests
     if args.algo == "crc32":
-        base_chk = struct.pack("<I", zlib.crc32(base) & 0xFFFFFFFF) + b"\x00" * 28
-        tgt_chk = struct.pack("<I", zlib.crc32(target) & 0xFFFFFFFF) + b"\x00" * 28
+        base_chk = _U32_STRUCT.pack(crc32(base)) + b"\x00" * 28
+        tgt_chk = base_chk if identical else (
+            _U32_STRUCT.pack(crc32(target)) + b"\x00" * 28
+        )
         algo = ALGO_CRC32
         chunk_has_crc = 1
     else:
@@ -350,7 +751,7 @@ def main() -> None:
         algo = ALGO_NONE
         chunk_has_crc = 0
 
-    # 5) Auto metadata (TFLite-aware), if requested
+    # 3) Auto metadata (TFLite-aware), if requested
     auto_req_arena = auto_abi = auto_opset = auto_io = None
     if args.auto_meta:
         if compute_from_tflite is None:
@@ -368,46 +769,35 @@ def main() -> None:
                 print(f"[TinyMLDelta] Auto-metadata unavailable: {e}")
                 auto_req_arena = auto_abi = auto_opset = auto_io = None
 
-    # 6) Manual overrides take precedence over auto-meta
+    # 4) Manual overrides take precedence over auto-meta
     req_arena = args.req_arena if args.req_arena is not None else (auto_req_arena or 0)
     tflm_abi = args.tflm_abi if args.tflm_abi is not None else (auto_abi or 0)
     opset = args.opset_hash if args.opset_hash is not None else (auto_opset or 0)
     io_hash = args.io_hash if args.io_hash is not None else (auto_io or 0)
 
-    # 7) Build metadata TLVs
+    # 5) Build metadata TLVs
     meta = bytearray()
     if req_arena and req_arena > 0:
-        meta += tlv(TMD_META_REQ_ARENA_BYTES, struct.pack("<I", int(req_arena)))
+        meta += tlv(TMD_META_REQ_ARENA_BYTES, _U32_STRUCT.pack(int(req_arena)))
     if tflm_abi and tflm_abi > 0:
-        meta += tlv(TMD_META_TFLM_ABI, struct.pack("<H", int(tflm_abi & 0xFFFF)))
+        meta += tlv(TMD_META_TFLM_ABI, _U16_STRUCT.pack(int(tflm_abi & 0xFFFF)))
     if opset and opset > 0:
-        meta += tlv(TMD_META_OPSET_HASH, struct.pack("<I", int(opset & 0xFFFFFFFF)))
+        meta += tlv(TMD_META_OPSET_HASH, _U32_STRUCT.pack(int(opset & 0xFFFFFFFF)))
     if io_hash and io_hash > 0:
-        meta += tlv(TMD_META_IO_HASH, struct.pack("<I", int(io_hash & 0xFFFFFFFF)))
+        meta += tlv(TMD_META_IO_HASH, _U32_STRUCT.pack(int(io_hash & 0xFFFFFFFF)))
 
     v = 1
     meta_len = len(meta)
     flags = 0
 
-    # 8) Encode chunks with optional RLE
-    chunks = []
-    for off, raw in diffs:
-        rle = rle_encode(raw)
-        if len(rle) < len(raw):
-            enc = ENC_RLE
-            data = rle
-        else:
-            enc = ENC_RAW
-            data = raw
-        chunks.append((off, enc, data))
-
-    # 9) Write final patch
-    with open(args.out, "wb") as out:
-        hdr = struct.pack(
-            HDR_FMT,
+    # 6) Stream chunks: diff, RLE-encode, CRC and write them batch by batch
+    #    behind a placeholder header, then rewrite the header once the
+    #    final chunk count is known (or count first, for non-seekable output).
+    def _header(chunks_n: int) -> bytes:
+        return _HDR_STRUCT.pack(
             v,
             algo,
-            len(chunks),
+            chunks_n,
             len(base),
             len(target),
             base_chk,
@@ -415,25 +805,45 @@ def main() -> None:
             meta_len,
             flags,
         )
-        out.write(hdr)
+
+    with open(args.out, "wb", buffering=1 << 20) as out:
+        if identical:
+            chunks = ()
+        else:
+            chunks = iter_chunks(
+                base, target, merge_gap=args.merge_gap, min_chunk=args.min_chunk
+            )
+        seekable = out.seekable()
+        if not seekable:
+            # A pipe can't be rewound to patch the header, so collect the
+            # chunks up front. RAW chunk data are views of target, so the list
+            # holds little beyond the RLE output.
+            chunks = list(chunks)
+        out.write(_header(0 if seekable else len(chunks)))
         if meta_len:
             out.write(meta)
-        for off, enc, data in chunks:
-            chdr = struct.pack(CHUNK_FMT, off, len(data), enc, chunk_has_crc)
-            out.write(chdr)
-            if chunk_has_crc:
-                out.write(struct.pack("<I", zlib.crc32(data) & 0xFFFFFFFF))
-            out.write(data)
+        chunks_n, encoded_bytes = stream_chunks(out, chunks, chunk_has_crc)
+        if seekable:
+            out.seek(0)
+            out.write(_header(chunks_n))
+
+    # Release the model mappings, once no chunk views of them remain.
+    del chunks
+    for buf in (base, target):
+        if isinstance(buf, mmap.mmap):
+            buf.close()
 
     print(f"TinyMLDelta patch written: {args.out}")
     print(
-        f"Chunks: {len(chunks)}  "
-        f"Encoded bytes: {sum(len(d) for _, _, d in chunks)}  "
+        f"Chunks: {chunks_n}  "
+        f"Encoded bytes: {encoded_bytes}  "
         f"Meta: {meta_len} bytes"
     )
 
-    # 10) Debug header dump (so you can see what runtime will parse)
-    debug_print_patch_header(args.out)
+    # 7) Debug header dump (so you can see what runtime will parse). A pipe
+    #    can't be read back; reopening it would consume the patch itself.
+    if seekable:
+        debug_print_patch_header(args.out)
 
     if args.auto_meta:
         print(
@@ -14,20 +14,65 @@ It produces:
     base.tflite   – initial model (Conv1D + Dense)
     target.tflite – same architecture, slightly nudged weights
 
+The target is derived from base.tflite by nudging the dense2 kernel bytes
+in place (requires the `tflite` schema package), so the two files differ
+only in that tensor. Without `tflite` the model is converted a second time.
+
+With --no-tf (or when TensorFlow is not installed) the same graph is
+written as a handwritten TFLite flatbuffer with random weights, so only
+numpy and `tflite` are needed.
+
 Users can test TinyMLDelta patch generation and embedded delta-apply flows
 without training or collecting data.
 
 Usage:
-    python3 make_models.py
+    python3 make_models.py [--no-quantize] [--seed N] [--no-tf]
 
 Outputs:
     base.tflite
     target.tflite
 """
 
-import tensorflow as tf
+import argparse
+
 import numpy as np
 
+# TensorFlow takes seconds to import, so it is loaded by import_tensorflow()
+# only once a conversion is actually needed (not for --help or --no-tf).
+tf = None
+
+try:
+    import flatbuffers  # type: ignore
+    import tflite  # type: ignore
+except Exception:
+    flatbuffers = None
+    tflite = None
+
+
+def import_tensorflow():
+    """
+    Import TensorFlow on first use.
+
+    Returns:
+        The tensorflow module, or None if it is not installed.
+    """
+    global tf
+    if tf is None:
+        try:
+            import tensorflow  # type: ignore
+        except ImportError as e:
+            # Only a missing package means "no TensorFlow"; a broken install
+            # (e.g. a missing shared library) should surface, not fall back.
+            if e.name != "tensorflow":
+                raise
+            return None
+        tf = tensorflow
+    return tf
+
+
+# Fixed seed so repeated runs produce byte-identical models (and patches).
+DEFAULT_SEED = 0x7D1A
+
 
 # -----------------------------------------------------------------------------
 # Model builder
@@ -62,49 +107,382 @@ def build_sensor_model():
 # -----------------------------------------------------------------------------
 # TFLite export helper
 # -----------------------------------------------------------------------------
-def save_tflite(keras_model, path: str):
+def make_converter(keras_model, quantize: bool = True):
     """
-    Convert a Keras model to TFLite and write it to disk.
+    Create a TFLite converter for a Keras model.
+
+    The converter reads the model's variables at convert() time, so one
+    instance can be reused after the weights change.
 
     Args:
         keras_model: Keras model instance.
-        path: Output .tflite filename.
+        quantize: Apply dynamic-range weight quantization. Without it the
+                  dense1 kernel alone is ~230 KiB of float32.
     """
     converter = tf.lite.TFLiteConverter.from_keras_model(keras_model)
-    # Keep size small for MCUs; enables weight quantization and other tricks.
-    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantize:
+        # Keep size small for MCUs; enables weight quantization and other tricks.
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    return converter
+
+
+def save_tflite(converter, path: str) -> bytes:
+    """
+    Convert to TFLite and write the result to disk.
+
+    Args:
+        converter: TFLiteConverter from make_converter().
+        path: Output .tflite filename.
+
+    Returns:
+        The serialized TFLite flatbuffer.
+    """
     tflite_model = converter.convert()
+    write_tflite(tflite_model, path)
+    return tflite_model
+
+
+def write_tflite(tflite_model, path: str):
+    """
+    Write a serialized TFLite flatbuffer to disk.
 
+    Args:
+        tflite_model: Flatbuffer bytes.
+        path: Output .tflite filename.
+    """
     with open(path, "wb") as f:
         f.write(tflite_model)
 
     print(f"[ModelGen] Saved {path} ({len(tflite_model)} bytes)")
 
 
+# -----------------------------------------------------------------------------
+# Handwritten flatbuffer (no TensorFlow)
+# -----------------------------------------------------------------------------
+# Like the converter's weight quantization, constant tensors smaller than this
+# stay float32 (so dense2 remains a float32 kernel in both build paths).
+QUANT_MIN_ELEMENTS = 1024
+
+
+def build_sensor_tflite(rng, quantize: bool = True) -> bytes:
+    """
+    Serialize the sensor model as a TFLite flatbuffer without TensorFlow.
+
+    The graph matches build_sensor_model() as the converter lowers it:
+    Conv1D becomes Reshape to a height-1 NHWC image plus CONV_2D, Flatten
+    becomes RESHAPE, and Dense becomes FULLY_CONNECTED. Weights are random
+    (not trained); large kernels are int8 with a per-tensor scale when
+    quantize is set, as with dynamic-range quantization.
+
+    Args:
+        rng: numpy.random.Generator for the initial weights.
+        quantize: Store kernels of QUANT_MIN_ELEMENTS or more as int8.
+
+    Returns:
+        The serialized TFLite flatbuffer.
+    """
+    TT = tflite.TensorType
+    buffers = [b""]  # buffer 0 is the conventional empty buffer
+    tensors = []     # (name, shape, type, buffer index, quant scale or None)
+    ops = []         # (opcode index, inputs, outputs, options type, options builder)
+
+    def tensor(name, shape, ttype=TT.FLOAT32, data=None, scale=None):
+        buf = 0
+        if data is not None:
+            buffers.append(data)
+            buf = len(buffers) - 1
+        tensors.append((name, shape, ttype, buf, scale))
+        return len(tensors) - 1
+
+    def kernel(name, shape):
+        w = rng.standard_normal(size=shape, dtype=np.float32)
+        np.multiply(w, 0.1, out=w)
+        if quantize and w.size >= QUANT_MIN_ELEMENTS:
+            scale = float(np.abs(w).max()) / 127.0 or 1.0
+            q = np.clip(np.rint(w / scale), -127, 127).astype(np.int8)
+            return tensor(name, shape, TT.INT8, q.tobytes(), scale)
+        return tensor(name, shape, TT.FLOAT32, w.tobytes())
+
+    def bias(name, n):
+        return tensor(name, (n,), TT.FLOAT32, np.zeros(n, np.float32).tobytes())
+
+    b = flatbuffers.Builder(1024)
+
+    def int_vector(values, dtype=np.int32):
+        return b.CreateNumpyVector(np.asarray(values, dtype=dtype))
+
+    def table_vector(start_vector, offsets):
+        start_vector(b, len(offsets))
+        for off in reversed(offsets):
+            b.PrependUOffsetTRelative(off)
+        return b.EndVector()
+
+    RESHAPE, CONV_2D, FULLY_CONNECTED = range(3)
+    opcodes = (tflite.BuiltinOperator.RESHAPE,
+               tflite.BuiltinOperator.CONV_2D,
+               tflite.BuiltinOperator.FULLY_CONNECTED)
+
+    def reshape(x, name, shape):
+        def options():
+            new_shape = int_vector(shape)
+            tflite.ReshapeOptionsStart(b)
+            tflite.ReshapeOptionsAddNewShape(b, new_shape)
+            return tflite.ReshapeOptionsEnd(b)
+        shape_t = tensor(f"{name}/shape", (len(shape),), TT.INT32,
+                         np.asarray(shape, np.int32).tobytes())
+        y = tensor(name, shape)
+        ops.append((RESHAPE, [x, shape_t], [y], tflite.BuiltinOptions.ReshapeOptions, options))
+        return y
+
+    def conv(x, name, width, filters, ksize, in_ch):
+        def options():
+            tflite.Conv2DOptionsStart(b)
+            tflite.Conv2DOptionsAddPadding(b, tflite.Padding.VALID)
+            tflite.Conv2DOptionsAddStrideW(b, 1)
+            tflite.Conv2DOptionsAddStrideH(b, 1)
+            tflite.Conv2DOptionsAddFusedActivationFunction(b, tflite.ActivationFunctionType.RELU)
+            return tflite.Conv2DOptionsEnd(b)
+        w = kernel(f"{name}/Conv2D", (filters, 1, ksize, in_ch))
+        bb = bias(f"{name}/BiasAdd", filters)
+        y = tensor(f"{name}/Relu", (1, 1, width - ksize + 1, filters))
+        ops.append((CONV_2D, [x, w, bb], [y], tflite.BuiltinOptions.Conv2DOptions, options))
+        return y
+
+    def dense(x, name, units, in_units, relu):
+        act = tflite.ActivationFunctionType.RELU if relu else tflite.ActivationFunctionType.NONE
+
+        def options():
+            tflite.FullyConnectedOptionsStart(b)
+            tflite.FullyConnectedOptionsAddFusedActivationFunction(b, act)
+            return tflite.FullyConnectedOptionsEnd(b)
+        w = kernel(f"{name}/MatMul", (units, in_units))
+        bb = bias(f"{name}/BiasAdd", units)
+        y = tensor(f"{name}/BiasAdd;{name}/MatMul", (1, units))
+        ops.append((FULLY_CONNECTED, [x, w, bb], [y],
+                    tflite.BuiltinOptions.FullyConnectedOptions, options))
+        return y
+
+    # Graph: (1, 64, 3) -> Conv1D(16, 5) -> Conv1D(32, 3) -> Flatten
+    #        -> Dense(32) -> Dense(3)
+    inp = tensor("input", (1, 64, 3))
+    x = reshape(inp, "conv1/ExpandDims", (1, 1, 64, 3))
+    x = conv(x, "conv1", 64, 16, 5, 3)
+    x = conv(x, "conv2", 60, 32, 3, 16)
+    x = reshape(x, "flatten/Reshape", (1, 58 * 32))
+    x = dense(x, "dense1", 32, 58 * 32, relu=True)
+    out = dense(x, "dense2", 3, 32, relu=False)
+
+    # Flatbuffers are built back to front: children before their parents.
+    buffer_offs = []
+    for data in buffers:
+        vec = None
+        if data:
+            # 16-byte align the payload, as the converter does.
+            b.Prep(16, len(data))
+            vec = b.CreateNumpyVector(np.frombuffer(data, dtype=np.uint8))
+        tflite.BufferStart(b)
+        if vec is not None:
+            tflite.BufferAddData(b, vec)
+        buffer_offs.append(tflite.BufferEnd(b))
+
+    tensor_offs = []
+    for name, shape, ttype, buf, scale in tensors:
+        name_off = b.CreateString(name)
+        shape_off = int_vector(shape)
+        quant_off = None
+        if scale is not None:
+            scale_off = b.CreateNumpyVector(np.asarray([scale], dtype=np.float32))
+            zero_off = int_vector([0], np.int64)
+            tflite.QuantizationParametersStart(b)
+            tflite.QuantizationParametersAddScale(b, scale_off)
+            tflite.QuantizationParametersAddZeroPoint(b, zero_off)
+            quant_off = tflite.QuantizationParametersEnd(b)
+        tflite.TensorStart(b)
+        tflite.TensorAddShape(b, shape_off)
+        tflite.TensorAddType(b, ttype)
+        tflite.TensorAddBuffer(b, buf)
+        tflite.TensorAddName(b, name_off)
+        if quant_off is not None:
+            tflite.TensorAddQuantization(b, quant_off)
+        tensor_offs.append(tflite.TensorEnd(b))
+
+    op_offs = []
+    for opcode, inputs, outputs, options_type, options in ops:
+        in_off = int_vector(inputs)
+        out_off = int_vector(outputs)
+        opts_off = options()
+        tflite.OperatorStart(b)
+        tflite.OperatorAddOpcodeIndex(b, opcode)
+        tflite.OperatorAddInputs(b, in_off)
+        tflite.OperatorAddOutputs(b, out_off)
+        tflite.OperatorAddBuiltinOptionsType(b, options_type)
+        tflite.OperatorAddBuiltinOptions(b, opts_off)
+        op_offs.append(tflite.OperatorEnd(b))
+
+    code_offs = []
+    for code in opcodes:
+        tflite.OperatorCodeStart(b)
+        tflite.OperatorCodeAddDeprecatedBuiltinCode(b, min(code, 127))
+        tflite.OperatorCodeAddBuiltinCode(b, code)
+        tflite.OperatorCodeAddVersion(b, 1)
+        code_offs.append(tflite.OperatorCodeEnd(b))
+
+    sg_tensors = table_vector(tflite.SubGraphStartTensorsVector, tensor_offs)
+    sg_inputs = int_vector([inp])
+    sg_outputs = int_vector([out])
+    sg_ops = table_vector(tflite.SubGraphStartOperatorsVector, op_offs)
+    sg_name = b.CreateString("main")
+    tflite.SubGraphStart(b)
+    tflite.SubGraphAddTensors(b, sg_tensors)
+    tflite.SubGraphAddInputs(b, sg_inputs)
+    tflite.SubGraphAddOutputs(b, sg_outputs)
+    tflite.SubGraphAddOperators(b, sg_ops)
+    tflite.SubGraphAddName(b, sg_name)
+    subgraph = tflite.SubGraphEnd(b)
+
+    codes_vec = table_vector(tflite.ModelStartOperatorCodesVector, code_offs)
+    subgraphs_vec = table_vector(tflite.ModelStartSubgraphsVector, [subgraph])
+    buffers_vec = table_vector(tflite.ModelStartBuffersVector, buffer_offs)
+    desc = b.CreateString("TinyMLDelta handwritten sensor model")
+    tflite.ModelStart(b)
+    tflite.ModelAddVersion(b, 3)
+    tflite.ModelAddOperatorCodes(b, codes_vec)
+    tflite.ModelAddSubgraphs(b, subgraphs_vec)
+    tflite.ModelAddDescription(b, desc)
+    tflite.ModelAddBuffers(b, buffers_vec)
+    b.Finish(tflite.ModelEnd(b), file_identifier=b"TFL3")
+    return bytes(b.Output())
+
+
+# -----------------------------------------------------------------------------
+# In-place flatbuffer weight access
+# -----------------------------------------------------------------------------
+def tflite_weights(model_buf: bytearray, layer_name: str):
+    """
+    Locate a layer's float32 kernel inside a TFLite flatbuffer.
+
+    The converter stores Dense kernels as rank-2 constant tensors whose name
+    contains the Keras layer name; weight-only quantization leaves small
+    kernels such as dense2 in float32.
+
+    Args:
+        model_buf: Mutable flatbuffer bytes (bytearray).
+        layer_name: Keras layer name, e.g. "dense2".
+
+    Returns:
+        A writable float32 NumPy view into model_buf, shaped like the tensor.
+    """
+    model = tflite.Model.GetRootAsModel(model_buf, 0)
+    sg = model.Subgraphs(0)
+    for i in range(sg.TensorsLength()):
+        t = sg.Tensors(i)
+        if layer_name not in t.Name().decode("utf-8", "replace"):
+            continue
+        if t.Type() != tflite.TensorType.FLOAT32 or t.ShapeLength() != 2:
+            continue
+        buf = model.Buffers(t.Buffer())
+        if buf.DataLength() == 0:
+            continue
+        # DataAsNumpy() is a uint8 view of model_buf itself; reinterpret it.
+        return buf.DataAsNumpy().view(np.float32).reshape(t.ShapeAsNumpy())
+    raise RuntimeError(f"no float32 kernel for layer '{layer_name}' in flatbuffer")
+
+
+def nudge_weights(weights, rng, scale: float = 0.005):
+    """
+    Add scaled Gaussian noise to float32 weight arrays in place.
+
+    Noise for all arrays is drawn as one float32 stream and scaled once,
+    then sliced per array, so no float64 temporary or extra result array is
+    allocated however many tensors are nudged.
+
+    Args:
+        weights: float32 NumPy arrays (may be views into a flatbuffer).
+        rng: numpy.random.Generator.
+        scale: Noise standard deviation.
+    """
+    noise = rng.standard_normal(size=sum(w.size for w in weights), dtype=np.float32)
+    np.multiply(noise, scale, out=noise)
+    off = 0
+    for w in weights:
+        np.add(w, noise[off:off + w.size].reshape(w.shape), out=w)
+        off += w.size
+
+
 # -----------------------------------------------------------------------------
 # Main
 # -----------------------------------------------------------------------------
 def main():
+    ap = argparse.ArgumentParser(
+        description="Generate base/target .tflite models for the TinyMLDelta demo."
+    )
+    ap.add_argument(
+        "--no-quantize",
+        action="store_true",
+        help="skip weight quantization (faster convert, float32 model)",
+    )
+    ap.add_argument(
+        "--seed",
+        type=int,
+        default=DEFAULT_SEED,
+        help=f"RNG seed for initial weights and the nudge (default: {DEFAULT_SEED:#x})",
+    )
+    ap.add_argument(
+        "--no-tf",
+        action="store_true",
+        help="write a handwritten flatbuffer instead of using TensorFlow "
+             "(needs only numpy and tflite)",
+    )
+    args = ap.parse_args()
+
+    use_tf = not args.no_tf and import_tensorflow() is not None
+    if not use_tf and tflite is None:
+        ap.error("needs TensorFlow, or the tflite package for --no-tf "
+                 "(pip install tflite)")
+    if not use_tf and not args.no_tf:
+        print("[ModelGen] TensorFlow not installed; writing the handwritten "
+              "random-weight model (as with --no-tf)")
+
+    rng = np.random.default_rng(args.seed)
+
     print("[ModelGen] Building base sensor model...")
 
-    # 1) Build the base model.
-    base_model = build_sensor_model()
+    if use_tf:
+        # Seeds Python, NumPy and TensorFlow, so Keras initializers are
+        # deterministic too.
+        tf.keras.utils.set_random_seed(args.seed)
+
+        # 1) Build the base model.
+        base_model = build_sensor_model()
+
+        converter = make_converter(base_model, quantize=not args.no_quantize)
 
-    # Export baseline version.
-    save_tflite(base_model, "base.tflite")
+        # Export baseline version.
+        base_tflite = save_tflite(converter, "base.tflite")
+    else:
+        # 1) Serialize the same graph directly, with random weights.
+        base_tflite = build_sensor_tflite(rng, quantize=not args.no_quantize)
+        write_tflite(base_tflite, "base.tflite")
 
     # 2) Create a “target” model by nudging the final Dense layer weights.
     print("[ModelGen] Nudging dense2 weights to create target version...")
-    dense2 = base_model.get_layer("dense2")
-    w, b = dense2.get_weights()
 
     # Minor random perturbation ensures small patch sizes while still
     # exercising the diff logic in TinyMLDelta.
-    w2 = w + 0.005 * np.random.randn(*w.shape).astype(w.dtype)
-    dense2.set_weights([w2, b])
+    if tflite is not None:
+        # Edit the kernel bytes of the converted model directly: no second
+        # conversion, and target differs from base only in that tensor.
+        target_tflite = bytearray(base_tflite)
+        nudge_weights([tflite_weights(target_tflite, "dense2")], rng)
+        write_tflite(target_tflite, "target.tflite")
+    else:
+        dense2 = base_model.get_layer("dense2")
+        w, b = dense2.get_weights()
+        nudge_weights([w], rng)
+        dense2.set_weights([w, b])
 
-    # Export updated version.
-    save_tflite(base_model, "target.tflite")
+        # Export updated version.
+        save_tflite(converter, "target.tflite")
 
     print("\n[ModelGen] Done.")
     print("Generated: base.tflite and target.tflite")
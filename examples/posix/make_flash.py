@@ -15,6 +15,23 @@ Creates a simulated flash image with:
 """
 
 import argparse
+import os
+import sys
+
+# Reuse the patch generator's gathered writer (os.writev on POSIX).
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "..", "cli"))
+from tinymldelta_patchgen import write_parts  # noqa: E402
+
+# Erased NOR flash reads back as 0xFF; gaps are filled in pieces of this size.
+ERASED_FILL = b"\xff" * 65536
+
+
+def erased(n):
+    """Return views of ERASED_FILL covering n bytes (no copies)."""
+    fill = memoryview(ERASED_FILL)
+    full, rest = divmod(n, len(fill))
+    return [fill] * full + ([fill[:rest]] if rest else [])
 
 
 def main():
@@ -37,18 +54,14 @@ def main():
             f"Base model is too large ({len(base_bytes)} > {slot_size})"
         )
 
-    # Prepare flash contents
-    flash = bytearray([0xFF] * flash_size)
-
-    # Slot A: base model at offset 0
-    flash[0:len(base_bytes)] = base_bytes
-
-    # Slot B: copy of slot A
-    flash[slot_size:slot_size + len(base_bytes)] = base_bytes
+    # Write the image as one gathered write of its parts (slot A model +
+    # erased tail, slot B copy + erased tail); nothing flash-sized is built
+    # in memory.
+    parts = [base_bytes] + erased(slot_size - len(base_bytes))
+    parts += [base_bytes] + erased(flash_size - slot_size - len(base_bytes))
 
-    # Write flash image
     with open(args.flash, "wb") as f:
-        f.write(flash)
+        write_parts(f, parts)
 
     print(f"[make_flash] Created flash: {args.flash} ({flash_size} bytes)")
     print(f"[make_flash] Slot size: {slot_size} bytes")
@@ -22,12 +22,23 @@ Usage:
 """
 
 import argparse
+import mmap
 import os
 import struct
+from typing import Optional, Tuple
 
 # Keep this header layout in sync with cli/tinymldelta_patchgen.py and
 # runtime/include/tinymldelta_internal.h.
 HDR_FMT = "<BBHII32s32sHH"
+_HDR = struct.Struct(HDR_FMT)
+
+# Targets at least this large are mapped rather than read into memory.
+TARGET_MMAP_MIN = 4096
+
+# Default A/B slot size: TMD_POSIX_SLOT_BYTES in flash_layout.h, and half of
+# make_flash.py's default image. Not derived from the image size, because
+# the port's journal is appended after the slots once demo_apply has run.
+DEFAULT_SLOT_SIZE = 128 * 1024
 
 
 def read_file(path: str) -> bytes:
@@ -46,6 +57,59 @@ def read_file(path: str) -> bytes:
         return f.read()
 
 
+def map_file(path: str, min_size: int = 1):
+    """Map a file read-only into memory.
+
+    The OS pages the file in on demand, so large flash images are scanned
+    in place instead of being copied into a bytes object first.
+
+    Args:
+        path:     Path to the file.
+        min_size: Files smaller than this are read into bytes instead, where
+                  a mapping is not worth its setup cost.
+
+    Returns:
+        A read-only mmap.mmap of the file, or its bytes if it is smaller than
+        min_size (an empty file cannot be mapped and always gives b"").
+
+    Raises:
+        OSError: If the file cannot be opened/read.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < max(min_size, 1):
+            return f.read()
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def find_target(flash_bytes, target_bytes,
+                slot_size: Optional[int] = None) -> Tuple[int, Optional[str]]:
+    """Locate the target model inside the flash image.
+
+    The demo writes models at fixed slot offsets (A at 0, B at slot_size),
+    so those are checked first: a window-limited find() is an exact compare
+    of just that slot's first len(target) bytes, so a match there cannot
+    come from a partial copy elsewhere. A scan is the fallback; with an
+    explicit slot_size it is confined to the two slots (the first
+    2 * slot_size bytes), otherwise it covers the whole image.
+
+    Args:
+        flash_bytes:  Flash image contents (bytes or mmap).
+        target_bytes: Target model contents (bytes or mmap).
+        slot_size:    A/B slot size in bytes, or None for DEFAULT_SLOT_SIZE.
+
+    Returns:
+        (offset, slot) where slot is "A", "B" or None when the target was
+        only found off-slot; offset is -1 if not found at all.
+    """
+    n = len(target_bytes)
+    slot_b = slot_size if slot_size is not None else DEFAULT_SLOT_SIZE
+    for slot, off in (("A", 0), ("B", slot_b)):
+        if flash_bytes.find(target_bytes, off, off + n) == off:
+            return off, slot
+    end = 2 * slot_size if slot_size is not None else len(flash_bytes)
+    return flash_bytes.find(target_bytes, 0, end), None
+
+
 def debug_print_patch_header(path: str) -> None:
     """Print a parsed TinyMLDelta patch header for debugging.
 
@@ -58,15 +122,14 @@ def debug_print_patch_header(path: str) -> None:
         print(f"[verify_flash] WARNING: could not read patch file {path}: {e}")
         return
 
-    if len(data) < struct.calcsize(HDR_FMT):
+    if len(data) < _HDR.size:
         print(f"[verify_flash] WARNING: patch too small for header: {path}")
         return
 
-    hdr_bytes = data[: struct.calcsize(HDR_FMT)]
     v, algo, chunks_n, base_len, target_len, base_chk, tgt_chk, meta_len, flags = \
-        struct.unpack(HDR_FMT, hdr_bytes)
+        _HDR.unpack_from(data, 0)
 
-    first16 = " ".join(f"{b:02x}" for b in hdr_bytes[:16])
+    first16 = data[:16].hex(" ")
 
     print("[verify_flash] Patch header:")
     print(f"  file       : {path}")
@@ -104,22 +167,50 @@ def main() -> int:
         required=False,
         help="Optional path to patch file for header debug",
     )
+    ap.add_argument(
+        "--slot-size",
+        type=int,
+        default=None,
+        help="A/B slot size in bytes. Slot B is probed at this offset "
+             f"(default: {DEFAULT_SLOT_SIZE}, as in flash_layout.h); when "
+             "given, the fallback search is also limited to the two slots "
+             "instead of the whole image",
+    )
 
     args = ap.parse_args()
+    if args.slot_size is not None and args.slot_size <= 0:
+        ap.error("--slot-size must be positive")
 
     # Optional patch header dump
     if args.patch:
         debug_print_patch_header(args.patch)
 
-    # Read flash + target
+    # Map flash (the target is loaded in verify())
     try:
-        flash_bytes = read_file(args.flash)
+        flash_bytes = map_file(args.flash)
     except OSError as e:
         print(f"[verify_flash] ERROR: flash image not found: {args.flash} ({e})")
         return 1
 
     try:
-        target_bytes = read_file(args.target)
+        return verify(args, flash_bytes)
+    finally:
+        if isinstance(flash_bytes, mmap.mmap):
+            flash_bytes.close()
+
+
+def verify(args: argparse.Namespace, flash_bytes) -> int:
+    """Check that the target model appears in the (mapped) flash image.
+
+    Args:
+        args:        Parsed CLI arguments.
+        flash_bytes: Flash image contents (bytes or mmap).
+
+    Returns:
+        0 on success (target found), non-zero on failure.
+    """
+    try:
+        target_bytes = map_file(args.target, TARGET_MMAP_MIN)
     except OSError as e:
         print(f"[verify_flash] ERROR: target model not found: {args.target} ({e})")
         return 1
@@ -127,13 +218,22 @@ def main() -> int:
     print(f"[verify_flash] flash:  {args.flash} ({len(flash_bytes)} bytes)")
     print(f"[verify_flash] target: {args.target} ({len(target_bytes)} bytes)")
 
-    # Simple containment check.
-    offset = flash_bytes.find(target_bytes)
+    # Containment check: known slot offsets first, then a scan.
+    try:
+        if len(target_bytes) > len(flash_bytes):
+            print("[verify_flash] ERROR: target model is larger than the flash image.")
+            return 2
+        offset, slot = find_target(flash_bytes, target_bytes, args.slot_size)
+    finally:
+        if isinstance(target_bytes, mmap.mmap):
+            target_bytes.close()
+
     if offset < 0:
         print("[verify_flash] ERROR: target model bytes not found in flash image.")
         return 2
 
-    print(f"[verify_flash] SUCCESS: target model found at offset {offset} in flash image.")
+    where = f"slot {slot}, offset {offset}" if slot else f"offset {offset}"
+    print(f"[verify_flash] SUCCESS: target model found at {where} in flash image.")
     return 0
 
 